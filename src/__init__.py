@@ -1,3 +1,8 @@
 #!/usr/bin/env python3
 
-from .opensubtitles import OpenSubtitles
\ No newline at end of file
+from .opensubtitles import OpenSubtitles
+from .pipeline import Pipeline
+from .config import Config
+from .api import Result, scrape, scrape_async
+from .cues import Cues, CueCorpus
+from .search_index import SubtitleIndex
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# import libraries
+import asyncio
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from .config import Config
+from .opensubtitles import OpenSubtitles
+from .pipeline import Pipeline
+
+@dataclass
+class Result:
+    """The outcome of a single movie.
+
+    Attributes:
+        index (int): The index of the query of the movie.
+        name (str): The IMDb ID of the movie, or the hash of the video file for hash searches.
+        status (str): 'downloaded', 'parsed' (metadata only), 'unchanged' (incremental), 'corrupt' (verify downloads) or 'not_found'.
+        query (dict): The search query, containing an imdb_id or a movie_hash, movie_byte_size and video_path.
+        page_type (int): The type of the search page, see MainOperations.detect_page_type.
+        results (dict): The parse results of the first subtitle, see ParseResult.results.
+        file_path (str): The path of the downloaded file, if it is known.
+        verification (str): The reason why the downloaded archive is corrupt, if it is.
+    """
+    index: int
+    name: str
+    status: str
+    query: dict
+    page_type: Optional[int] = None
+    results: Optional[dict] = None
+    file_path: Optional[str] = None
+    verification: Optional[str] = None
+
+    @classmethod
+    def from_record(cls, record: dict, index: int) -> 'Result':
+        """Create a Result from a record of OpenSubtitles.
+
+        Args:
+            record (dict): The record returned by OpenSubtitles.search or OpenSubtitles.finish_download.
+            index (int): The index of the query of the movie.
+
+        Returns:
+            Result: The outcome of the movie.
+        """
+        return cls(
+            index=index,
+            name=record['name'],
+            status=record['status'],
+            query=record['query'],
+            page_type=record['page_type'],
+            results=record['results'],
+            file_path=record['file_path'],
+            verification=record.get('verification')
+        )
+
+def _configure(imdb_ids: Optional[Iterable[str]], config: Optional[Config]) -> Config:
+    """Get the config of a run, with the given IMDb IDs if any."""
+    config = config or Config()
+    return replace(config, imdb_id=list(imdb_ids)) if imdb_ids is not None else config
+
+def scrape(imdb_ids: Optional[Iterable[str]] = None, config: Optional[Config] = None) -> Iterator[Result]:
+    """Get subtitles for the given movies one by one, yielding each result as soon as it completes.
+
+    The outcome of each movie is yielded instead of printed, but warnings are still printed to stdout
+    (e.g. CAPTCHA, missing download buttons and corrupt or unreadable archives). The browser is closed when the
+    iteration ends or is stopped.
+
+    Args:
+        imdb_ids (Iterable[str]): The IMDb IDs of the movies. Can be omitted if config.video_path is given.
+        config (Config): The settings of the scraper. Default settings are used if omitted.
+
+    Yields:
+        Result: The outcome of each movie, in the order of the IMDb IDs.
+    """
+    opensubs = OpenSubtitles(_configure(imdb_ids, config))
+
+    try:
+        for index, record in opensubs.stream():
+            yield Result.from_record(record, index)
+
+    finally:
+        opensubs.quit_webdriver(opensubs.driver)
+
+async def scrape_async(imdb_ids: Optional[Iterable[str]] = None, config: Optional[Config] = None) -> AsyncIterator[Result]:
+    """Get subtitles for the given movies through the pipeline, yielding each result as soon as it completes.
+
+    The browsers are started and closed in executor threads, so the event loop is never blocked.
+
+    Args:
+        imdb_ids (Iterable[str]): The IMDb IDs of the movies. Can be omitted if config.video_path is given.
+        config (Config): The settings of the scraper, config.browsers and config.download_workers set the concurrency.
+            Default settings are used if omitted.
+
+    Yields:
+        Result: The outcome of each movie, in the order of the IMDb IDs.
+    """
+    loop = asyncio.get_running_loop()
+    pipeline = await loop.run_in_executor(None, Pipeline, _configure(imdb_ids, config))
+
+    stream = pipeline.stream()
+    try:
+        async for index, record in stream:
+            yield Result.from_record(record, index)
+
+    finally:
+        # Stop the stages and save the sync state before the executor and browsers are closed
+        await stream.aclose()
+        await loop.run_in_executor(None, pipeline.close)
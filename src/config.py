@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# import libraries
+from typing import List, Optional
+from dataclasses import dataclass, field, fields
+
+@dataclass
+class Config:
+    """The settings of the scraper, with the same names and defaults as the command line arguments of subscraper.py.
+
+    Every class reading its settings from `args` accepts a Config as well as an argparse Namespace.
+    """
+
+    # main
+    imdb_id: List[str] = field(default_factory=list)
+
+    # filter
+    subtitle_type: str = 'srt'
+    language: str = 'eng'
+
+    # driver
+    incognito: bool = True
+    headless: bool = False
+    remote_webdriver: List[str] = field(default_factory=list)
+    remote_max_sessions: int = 1
+
+    # download
+    output_path: str = 'dump'
+    safe_downloading: bool = False
+    change_file_names: bool = False
+    metadata_only: bool = False
+    incremental: bool = False
+    shard_downloads: bool = False
+
+    # process
+    save_process: bool = False
+    save_process_path: str = 'process'
+    reset_process: bool = False
+
+    # library
+    video_path: Optional[str] = None
+    hash_workers: int = 8
+
+    # pipeline
+    pipeline: bool = False
+    browsers: int = 1
+    download_workers: int = 4
+
+    # verify
+    verify_downloads: bool = False
+    verify_archives: bool = False
+    verify_workers: Optional[int] = None
+
+    # corpus
+    build_cue_corpus: bool = False
+    cue_corpus_path: str = 'corpus/cues.bin'
+
+    # search
+    search_index_path: Optional[str] = None
+    update_search_index: bool = False
+    search_subtitles: Optional[str] = None
+
+    @classmethod
+    def from_args(cls, args) -> 'Config':
+        """Create a Config from the command line arguments.
+
+        Args:
+            args: A Namespace object containing command line arguments parsed by argparse in subscraper.py.
+
+        Returns:
+            Config: The settings given on the command line, with defaults for the missing ones.
+        """
+        return cls(**{item.name: getattr(args, item.name) for item in fields(cls) if hasattr(args, item.name)})
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+# import libraries
+import os
+import re
+import zlib
+import mmap
+import shutil
+import struct
+import zipfile
+import tempfile
+from array import array
+
+# Timing line of a cue, e.g. "00:01:02,345 --> 00:01:04,000"
+TIMING = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+
+# Header of a corpus file: magic, number of documents, number of cues and size of the text blob
+CORPUS_MAGIC = b'SUBCUES1'
+CORPUS_HEADER = struct.Struct('<8sQQQ')
+
+# Size of the null padded IMDb ID of each document in a corpus file
+KEY_SIZE = 16
+
+def to_milliseconds(hours: str, minutes: str, seconds: str, fraction: str) -> int:
+    """Convert the parts of an SRT timestamp to milliseconds.
+
+    Returns:
+        int: The timestamp in milliseconds.
+    """
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, '0'))
+
+def decode_subtitle(data: bytes) -> str:
+    """Decode the content of a subtitle file, which is UTF-8 or, for most older subtitles, Windows-1252.
+
+    Args:
+        data (bytes): The content of the file.
+
+    Returns:
+        str: The decoded text.
+    """
+    try:
+        return data.decode('utf-8-sig')
+
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+def read_subtitle(file_path: str) -> bytes:
+    """Read a subtitle file, extracting the largest .srt file if it is a zip archive downloaded from OpenSubtitles.
+
+    Args:
+        file_path (str): The path of the .srt or .zip file.
+
+    Returns:
+        bytes: The content of the subtitle file, or None if the archive has no .srt file.
+    """
+    if not zipfile.is_zipfile(file_path):
+        with open(file_path, 'rb') as file:
+            return file.read()
+
+    with zipfile.ZipFile(file_path) as archive:
+        members = [info for info in archive.infolist() if info.filename.lower().endswith('.srt')]
+        if not members:
+            return None
+
+        return archive.read(max(members, key=lambda info: info.file_size))
+
+class Cues:
+    """The cues of a subtitle in a columnar representation.
+
+    The timings are kept in two int32 arrays and the texts in a single UTF-8 blob, so a subtitle costs a few
+    objects no matter how many cues it has.
+
+    Attributes:
+        starts (array): The start time of each cue in milliseconds.
+        ends (array): The end time of each cue in milliseconds.
+        offsets (array): The offset of each cue text in the blob, followed by the size of the blob.
+        text (bytes): The UTF-8 texts of the cues, lines separated by '\\n'.
+    """
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: bytes):
+        """Initializes a new instance of the Cues class.
+
+        Args:
+            starts (array): The start time of each cue in milliseconds.
+            ends (array): The end time of each cue in milliseconds.
+            offsets (array): The offset of each cue text in the blob, followed by the size of the blob.
+            text (bytes): The UTF-8 texts of the cues.
+        """
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def parse(cls, data: bytes) -> 'Cues':
+        """Parse the content of an SRT file. Blocks without a valid timing line are skipped.
+
+        Args:
+            data (bytes): The content of the SRT file.
+
+        Returns:
+            Cues: The parsed cues.
+        """
+        starts, ends, offsets = array('i'), array('i'), array('q')
+        texts = list()
+        size = 0
+
+        text = decode_subtitle(data).replace('\r\n', '\n').replace('\r', '\n')
+        for block in re.split(r'\n[ \t]*\n', text):
+            lines = block.strip('\n').split('\n')
+
+            # The timing line follows the cue number, which some files omit
+            for position, line in enumerate(lines[:2]):
+                timing = TIMING.search(line)
+                if timing:
+                    break
+            else:
+                continue
+
+            parts = timing.groups()
+            starts.append(to_milliseconds(*parts[:4]))
+            ends.append(to_milliseconds(*parts[4:]))
+
+            cue_text = '\n'.join(lines[position + 1:]).strip().encode('utf-8')
+            offsets.append(size)
+            texts.append(cue_text)
+            size += len(cue_text)
+
+        offsets.append(size)
+        return cls(starts, ends, offsets, b''.join(texts))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def cue(self, index: int) -> tuple:
+        """Get a single cue.
+
+        Args:
+            index (int): The index of the cue.
+
+        Returns:
+            tuple: The start and end time in milliseconds and the text of the cue.
+        """
+        return self.starts[index], self.ends[index], self.text[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+class CueCorpus:
+    """A memory-mapped file holding the cues of many subtitles, keyed by IMDb ID.
+
+    The file is laid out as the header followed by the sorted keys, the first cue of each document, and the
+    columns of all cues concatenated (see Cues). The columns are exposed as memoryviews of the mapped file,
+    so opening a corpus reads nothing but the header. Numbers are stored in the native byte order (little
+    endian on x86 and ARM), which lets the columns be mapped without any conversion.
+
+    Args:
+        corpus_path (str): The path of the corpus file.
+    """
+
+    def __init__(self, corpus_path: str):
+        """Initializes a new instance of the CueCorpus class by mapping the corpus file.
+
+        Args:
+            corpus_path (str): The path of the corpus file.
+        """
+        self.file = open(corpus_path, 'rb')
+        self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.doc_count, self.cue_count, text_size = CORPUS_HEADER.unpack_from(self.mapped, 0)
+        if magic != CORPUS_MAGIC:
+            self.close()
+            raise ValueError(f'{corpus_path} is not a cue corpus')
+
+        view = memoryview(self.mapped)
+        sections = self.section_sizes(self.doc_count, self.cue_count, text_size)
+        position = CORPUS_HEADER.size
+        columns = list()
+        for size, padded in sections:
+            columns.append(view[position:position + size])
+            position += padded
+
+        self.keys, doc_first, starts, ends, offsets, self.text = columns
+        self.doc_first = doc_first.cast('q')
+        self.starts = starts.cast('i')
+        self.ends = ends.cast('i')
+        self.offsets = offsets.cast('q')
+
+    @staticmethod
+    def section_sizes(doc_count: int, cue_count: int, text_size: int) -> list:
+        """Get the size of each section of a corpus file, with and without the padding keeping the next section aligned.
+
+        Returns:
+            list: The size and padded size of the keys, first cues, starts, ends, offsets and text sections.
+        """
+        sizes = [doc_count * KEY_SIZE, (doc_count + 1) * 8, cue_count * 4, cue_count * 4, (cue_count + 1) * 8, text_size]
+        return [(size, size + -size % 8) for size in sizes]
+
+    @classmethod
+    def build(cls, files: dict, corpus_path: str) -> int:
+        """Parse subtitle files and write them to a corpus file.
+
+        The cues are streamed to temporary files next to the corpus, so memory use does not grow with the corpus.
+        The corpus file is replaced at the end, so readers never see a partial file.
+
+        Args:
+            files (dict): The paths of the .srt or .zip files, keyed by IMDb ID.
+            corpus_path (str): The path of the corpus file.
+
+        Returns:
+            int: The number of subtitles written to the corpus.
+        """
+        dir_path = os.path.dirname(os.path.abspath(corpus_path))
+        os.makedirs(dir_path, exist_ok=True)
+
+        keys, doc_first = list(), array('q', [0])
+        cue_count = text_size = 0
+
+        with tempfile.TemporaryDirectory(dir=dir_path) as tmp:
+            columns = {name: open(f'{tmp}/{name}', 'w+b') for name in ('starts', 'ends', 'offsets', 'text')}
+
+            for imdb_id in sorted(files):
+                try:
+                    data = read_subtitle(files[imdb_id])
+                except (OSError, zipfile.BadZipFile, zlib.error, EOFError) as error:
+                    print(f'Warning: {imdb_id} could not be read ({error}): passed')
+                    continue
+
+                if data is None:
+                    print(f'Warning: {imdb_id} has no .srt file: passed')
+                    continue
+
+                cues = Cues.parse(data)
+                columns['starts'].write(cues.starts.tobytes())
+                columns['ends'].write(cues.ends.tobytes())
+                columns['offsets'].write(array('q', [offset + text_size for offset in cues.offsets[:-1]]).tobytes())
+                columns['text'].write(cues.text)
+
+                keys.append(imdb_id.encode('ascii').ljust(KEY_SIZE, b'\0'))
+                cue_count += len(cues)
+                text_size += len(cues.text)
+                doc_first.append(cue_count)
+
+            columns['offsets'].write(array('q', [text_size]).tobytes())
+
+            # Assemble the sections in a temporary file and move it over the corpus
+            sections = cls.section_sizes(len(keys), cue_count, text_size)
+            with open(f'{tmp}/corpus', 'wb') as corpus:
+                corpus.write(CORPUS_HEADER.pack(CORPUS_MAGIC, len(keys), cue_count, text_size))
+                corpus.write(b''.join(keys).ljust(sections[0][1], b'\0'))
+                corpus.write(doc_first.tobytes())
+
+                for name, (size, padded) in zip(columns, sections[2:]):
+                    columns[name].seek(0)
+                    shutil.copyfileobj(columns[name], corpus)
+                    columns[name].close()
+                    corpus.write(b'\0' * (padded - size))
+
+            os.replace(f'{tmp}/corpus', corpus_path)
+
+        return len(keys)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the views of the mapped file and close it."""
+        for name in ('keys', 'doc_first', 'starts', 'ends', 'offsets', 'text'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+
+        self.mapped.close()
+        self.file.close()
+
+    def key(self, doc: int) -> str:
+        """Get the IMDb ID of a document.
+
+        Args:
+            doc (int): The index of the document.
+
+        Returns:
+            str: The IMDb ID.
+        """
+        return bytes(self.keys[doc * KEY_SIZE:(doc + 1) * KEY_SIZE]).rstrip(b'\0').decode('ascii')
+
+    def find(self, imdb_id: str) -> int:
+        """Find a document by binary search over the sorted keys.
+
+        Args:
+            imdb_id (str): The IMDb ID of the document.
+
+        Returns:
+            int: The index of the document, or None if it is not in the corpus.
+        """
+        target = imdb_id.encode('ascii').ljust(KEY_SIZE, b'\0')
+        low, high = 0, self.doc_count
+
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self.keys[middle * KEY_SIZE:(middle + 1) * KEY_SIZE]) < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.doc_count and bytes(self.keys[low * KEY_SIZE:(low + 1) * KEY_SIZE]) == target:
+            return low
+
+        return None
+
+    def cue_range(self, imdb_id: str) -> range:
+        """Get the indexes of the cues of a movie, which can be used with the starts, ends and cue methods.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie.
+
+        Returns:
+            range: The indexes of the cues, empty if the movie is not in the corpus.
+        """
+        doc = self.find(imdb_id)
+        if doc is None:
+            return range(0)
+
+        return range(self.doc_first[doc], self.doc_first[doc + 1])
+
+    def cue(self, index: int) -> tuple:
+        """Get a single cue of the corpus.
+
+        Args:
+            index (int): The index of the cue in the corpus.
+
+        Returns:
+            tuple: The start and end time in milliseconds and the text of the cue.
+        """
+        return self.starts[index], self.ends[index], bytes(self.text[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
@@ -4,9 +4,14 @@
 import os
 import json
 from time import sleep
+from collections import OrderedDict
 from selenium.webdriver.common.by import By
 
 from .webdriver import Driver
+from .verify import verify_archives
+
+# Number of recent downloads whose file paths are kept in memory
+DOWNLOAD_INDEX_SIZE = 1024
 
 class MainOperations(Driver):
     """A collection of useful methods for web automation using Selenium WebDriver.
@@ -16,6 +21,7 @@ class MainOperations(Driver):
     Attributes:
         args (argparse.Namespace): The command line arguments parsed by argparse.
         driver (selenium.webdriver.remote.webdriver.WebDriver): The Selenium WebDriver instance.
+        download_index (OrderedDict): The file paths of recent downloads, keyed by subtitle ID.
 
     Methods:
         process_path() -> str:
@@ -29,10 +35,22 @@ class MainOperations(Driver):
         save_process(data: dict) -> None:
             Save information about the last saved movie, including its imdb_id and the results of its parsing.
 
-        last_movie(process_path: str) -> dict or None:
+        process_file -> str:
+            Get the name of the file where the process data is saved, metadata.json in metadata only mode.
+
+        saved_video_paths(process_path: str, process_file: str) -> set:
+            Get the video files of a library whose search is saved in the process file.
+
+        last_movie(process_path: str, process_file: str) -> dict or None:
             Get information about the last downloaded movie, including its imdb_id and the results of its parsing, 
             or None if the process file is not found.
 
+        downloaded_files(process_path: str) -> dict:
+            Get the paths of the downloaded subtitle files saved in process.json, keyed by IMDb ID.
+
+        verify_process(process_path: str, workers: int) -> list:
+            Check the downloaded archives saved in process.json, flag the corrupt ones and get their queries.
+
         xpath_exists(xpath: str) -> bool:
             Find element by XPath and check if it exists or not on the page. This method can be used to check the 
             existence of an element before performing any action on it.
@@ -49,10 +67,19 @@ class MainOperations(Driver):
         detect_captcha() -> bool:
             Check if the current page is a CAPTCHA page. Returns True if the page is a CAPTCHA page, False otherwise.
 
-        wait_while_downloading(subtitle_id: str) -> None:
+        set_download_folder(imdb_id: str) -> str:
+            Point the browser downloads to the folder of the given movie.
+
+        index_download(subtitle_id: str, file_path: str) -> None:
+            Remember the path of a downloaded subtitle file, dropping the oldest entry when the index is full.
+
+        find_download(subtitle_id: str, dir_path: str) -> str or None:
+            Get the path of a downloaded subtitle file, looking it up in the download index first.
+
+        wait_while_downloading(subtitle_id: str, imdb_id: str) -> str:
             Wait for a file to finish downloading before continuing.
 
-        change_file_name(self, subtitle_id: str, imdb_id: str) -> None:
+        change_file_name(self, subtitle_id: str, imdb_id: str) -> str:
             Rename a downloaded subtitle file using the provided IMDb ID.
 
     """
@@ -65,6 +92,7 @@ class MainOperations(Driver):
         """
         super().__init__(args),
         self.driver = self.webdriver()
+        self.download_index = OrderedDict()
 
     @property
     def process_path(self) -> str:
@@ -81,13 +109,25 @@ class MainOperations(Driver):
         else:
             return f"{os.path.abspath(os.path.join(os.path.abspath('.'), self.args.save_process_path))}"
 
+    @property
+    def process_file(self) -> str:
+        """Get the name of the file where the process data is saved.
+
+        Metadata only results are saved to metadata.json, so they neither resume nor get reset with the downloads
+        saved in process.json.
+
+        Returns:
+            str: The name of the process file.
+        """
+        return 'metadata.json' if self.args.metadata_only else 'process.json'
+
     def create_process_file(self):
         """Create a folder for saving the process data, whose name can be specified by the user. 
-        If the folder doesn't already exist, it will be created. If the process.json file doesn't 
+        If the folder doesn't already exist, it will be created. If the process file doesn't 
         exist, it will be created.
         """
         dir_path = self.process_path
-        process_file = f'{dir_path}/process.json'
+        process_file = f'{dir_path}/{self.process_file}'
         
         # Create the folder if it doesn't already exist
         os.makedirs(dir_path, exist_ok=True)
@@ -103,7 +143,7 @@ class MainOperations(Driver):
         Args:
             data (dict): A dictionary containing the imdb_id, download status, and parsing results for the movie.
         """
-        file_path = f'{self.process_path}/process.json'
+        file_path = f'{self.process_path}/{self.process_file}'
         if self.args.save_process:
             with open(file_path, 'r') as file:
                 try:
@@ -118,22 +158,26 @@ class MainOperations(Driver):
                 json.dump(existing_data, file, indent=4)
 
     @staticmethod
-    def last_movie(process_path):
+    def last_movie(process_path, process_file='process.json'):
         """Get information about the last downloaded movie.
 
         Args:
             process_path (str): The path to the folder where the process data is stored.
+            process_file (str): The name of the process file. Default is process.json.
 
         Returns:
             dict or None: A dictionary containing information about the last downloaded movie, 
             including its imdb_id and the results of its parsing, or None if the process file is not found.
         """
-        file_path = f'{process_path}/process.json'
+        file_path = f'{process_path}/{process_file}'
         try:
             with open(file_path, 'r') as file:
                 try:
                     result = json.load(file)
-                    return result[-1] if result else result
+
+                    # Movies downloaded again after a corrupt download are saved after later movies,
+                    # so the last movie is the one with the highest index
+                    return max(result, key=lambda data: data['index']) if result else result
                     
                 except json.decoder.JSONDecodeError:
                     return None
@@ -141,6 +185,120 @@ class MainOperations(Driver):
         except FileNotFoundError:
             return None
 
+    @staticmethod
+    def saved_video_paths(process_path, process_file='process.json') -> set:
+        """Get the video files of a library whose search is saved in the process file.
+
+        Args:
+            process_path (str): The path to the folder where the process data is stored.
+            process_file (str): The name of the process file. Default is process.json.
+
+        Returns:
+            set: The paths of the video files, leaving out the ones whose download was flagged as corrupt.
+        """
+        file_path = f'{process_path}/{process_file}'
+        try:
+            with open(file_path, 'r') as file:
+                result = json.load(file)
+
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return set()
+
+        video_paths = set()
+        for data in result:
+            if data.get('verification'):
+                continue
+
+            results = data['parsing_results']
+            video_path = results.get('video_path') if isinstance(results, dict) else data.get('video_path')
+            if video_path:
+                video_paths.add(video_path)
+
+        return video_paths
+
+    @staticmethod
+    def downloaded_files(process_path) -> dict:
+        """Get the downloaded subtitle files saved in process.json.
+
+        Args:
+            process_path (str): The path to the folder where the process data is stored.
+
+        Returns:
+            dict: The paths of the downloaded files that still exist, keyed by the IMDb ID (or hash) of their movie.
+            If a movie was downloaded more than once, its last download is kept.
+        """
+        files = dict()
+        file_path = f'{process_path}/process.json'
+        try:
+            with open(file_path, 'r') as file:
+                try:
+                    result = json.load(file)
+
+                except json.decoder.JSONDecodeError:
+                    return files
+
+        except FileNotFoundError:
+            return files
+
+        for data in result:
+            if data['download_status'] and data.get('file_path') and os.path.exists(data['file_path']):
+                results = data['parsing_results']
+                files[results['imdb_id'] or results['movie_hash']] = data['file_path']
+
+        return files
+
+    @staticmethod
+    def verify_process(process_path, workers: int = None) -> list:
+        """Check the downloaded archives saved in process.json in a process pool.
+
+        Corrupt archives are deleted, and their records are flagged with download_status False and the reason
+        in verification, so they can be downloaded again. Movies flagged before (by this check or by
+        verify_downloads) are downloaded again too, unless a later record of the same index is a download.
+
+        Args:
+            process_path (str): The path to the folder where the process data is stored.
+            workers (int): The number of processes, the number of CPUs if omitted.
+
+        Returns:
+            list: The index and search query of each movie still to download again, ordered by index.
+        """
+        file_path = f'{process_path}/process.json'
+        try:
+            with open(file_path, 'r') as file:
+                result = json.load(file)
+
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return list()
+
+        downloads = [data for data in result if data['download_status'] and data.get('file_path')]
+        errors = verify_archives([data['file_path'] for data in downloads], workers)
+
+        # Records are saved in order, so the last record of an index tells if the movie still has to be downloaded
+        corrupt, flagged = dict(), False
+        for data in result:
+            error = errors.get(data['file_path']) if data['download_status'] and data.get('file_path') else None
+            if error:
+                if os.path.exists(data['file_path']):
+                    os.remove(data['file_path'])
+
+                data['download_status'] = False
+                data['verification'] = error
+                flagged = True
+
+            if data['download_status']:
+                corrupt.pop(data['index'], None)
+
+            elif data.get('verification'):
+                results = data['parsing_results']
+                query = {key: results[key] for key in ('imdb_id', 'movie_hash', 'movie_byte_size', 'video_path') if key in results}
+                corrupt[data['index']] = query
+
+        if flagged:
+            with open(file_path, 'w', encoding='utf8') as file:
+                json.dump(result, file, indent=4)
+
+        return sorted(corrupt.items())
+
     def xpath_exists(self, xpath: str) -> bool:
         """Find element by XPath and check if it exists or not on the page.
         This method can be used to check the existence of an element before performing any action on it.
@@ -206,21 +364,90 @@ class MainOperations(Driver):
         """
         return True if 'captcha/redirect' in self.driver.current_url else False
 
-    def wait_while_downloading(self, subtitle_id: str):
+    def set_download_folder(self, imdb_id: str) -> str:
+        """
+        Point the browser downloads to the folder of the given movie.
+
+        The download folder of Chrome is set once when the driver starts, so it is only changed
+        through the DevTools protocol when downloads are sharded.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie about to be downloaded.
+
+        Returns:
+            str: The folder where the subtitle will be downloaded.
+        """
+        dir_path = self.shard_path(imdb_id)
+
+        if self.args.shard_downloads:
+            os.makedirs(dir_path, exist_ok=True)
+            self.driver.execute('executeCdpCommand', {'cmd': 'Page.setDownloadBehavior', 'params': {'behavior': 'allow', 'downloadPath': dir_path}})
+
+        return dir_path
+
+    def index_download(self, subtitle_id: str, file_path: str):
+        """
+        Remember the path of a downloaded subtitle file, dropping the oldest entry when the index is full.
+
+        Args:
+            subtitle_id (str): The ID of the subtitle file.
+            file_path (str): The path of the downloaded file.
+        """
+        self.download_index[subtitle_id] = file_path
+        self.download_index.move_to_end(subtitle_id)
+
+        if len(self.download_index) > DOWNLOAD_INDEX_SIZE:
+            self.download_index.popitem(last=False)
+
+    def find_download(self, subtitle_id: str, dir_path: str):
+        """
+        Get the path of a downloaded subtitle file.
+
+        The download index is checked first, so only files that were not seen yet cost a folder scan.
+        Unfinished Chrome downloads are ignored.
+
+        Args:
+            subtitle_id (str): The ID of the subtitle file.
+            dir_path (str): The folder where the subtitle was downloaded.
+
+        Returns:
+            str or None: The path of the file, or None if it is not downloaded yet.
+        """
+        file_path = self.download_index.get(subtitle_id)
+        if file_path and os.path.exists(file_path):
+            return file_path
+
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if subtitle_id in entry.name and not entry.name.endswith('.crdownload'):
+                        self.index_download(subtitle_id, entry.path)
+                        return entry.path
+
+        except FileNotFoundError:
+            pass
+
+        return None
+
+    def wait_while_downloading(self, subtitle_id: str, imdb_id: str = None):
         """
         Wait for a file to finish downloading before continuing.
         
         Args:
             subtitle_id (str): The ID of the subtitle file to wait for.
+            imdb_id (str): The IMDb ID of the movie, used to find its download folder.
+
+        Returns:
+            str: The path of the downloaded file.
         """
-        # Define a lambda function to check if the file with the given subtitle ID exists in the download directory
-        find_id = lambda _id: any(_id in elem for elem in os.listdir(self.download_path))
-        
+        dir_path = self.shard_path(imdb_id)
+
         while True:
             # Wait for a short amount of time before checking if the file has finished downloading
             sleep(.2)
-            if find_id(subtitle_id):
-                return False
+            file_path = self.find_download(subtitle_id, dir_path)
+            if file_path:
+                return file_path
 
     def change_file_name(self, subtitle_id: str, imdb_id: str):
         """
@@ -229,13 +456,18 @@ class MainOperations(Driver):
         Args:
             subtitle_id (str): The ID of the subtitle file to rename.
             imdb_id (str): The IMDb ID to use as the new name for the file.
+
+        Returns:
+            str: The new path of the file.
         """
-        dir_path = self.download_path
+        dir_path = self.shard_path(imdb_id)
         
-        # Find the filename of the downloaded subtitle file with the given ID
-        file_name = [elem for elem in os.listdir(dir_path) if subtitle_id in elem][0]
-        file_path = os.path.join(dir_path, file_name)
+        # Find the downloaded subtitle file with the given ID
+        file_path = self.find_download(subtitle_id, dir_path)
         
         # Create the new filename using the provided IMDb ID and rename the file
         new_file = f'{dir_path}/{imdb_id}.zip'
         os.rename(file_path, new_file)
+        self.index_download(subtitle_id, new_file)
+
+        return new_file
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# import libraries
+import os
+import json
+import mmap
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# Size of the head and tail chunks hashed by OpenSubtitles
+HASH_CHUNK_SIZE = 65536
+
+# File extensions treated as videos when walking a library
+VIDEO_EXTENSIONS = ('.avi', '.divx', '.m2ts', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg', '.mpg', '.ogm', '.ts', '.webm', '.wmv')
+
+def movie_hash(file_path: str) -> str:
+    """Compute the OpenSubtitles hash of a video file.
+
+    The hash is the file size plus the sum of the 64-bit little-endian words of the first and last 64 KiB
+    of the file, truncated to 64 bits. Only those two chunks are read, through a memory map.
+
+    Args:
+        file_path (str): The path of the video file.
+
+    Returns:
+        str: The hash as a 16 character hexadecimal string, or None if the file is too small to be hashed.
+    """
+    size = os.path.getsize(file_path)
+    if size < HASH_CHUNK_SIZE * 2:
+        return None
+
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            words = f'<{HASH_CHUNK_SIZE // 8}Q'
+            head = struct.unpack_from(words, mapped, 0)
+            tail = struct.unpack_from(words, mapped, size - HASH_CHUNK_SIZE)
+
+    return f'{(size + sum(head) + sum(tail)) & 0xFFFFFFFFFFFFFFFF:016x}'
+
+def find_videos(root: str) -> list:
+    """Walk a directory tree and get the paths of the video files in it.
+
+    Args:
+        root (str): The folder to walk.
+
+    Returns:
+        list: The absolute paths of the video files, sorted so that the order is stable between runs.
+    """
+    videos = list()
+    for dir_path, _, file_names in os.walk(os.path.abspath(root)):
+        for file_name in file_names:
+            if file_name.lower().endswith(VIDEO_EXTENSIONS):
+                videos.append(os.path.join(dir_path, file_name))
+
+    return sorted(videos)
+
+class MovieHashCache:
+    """A JSON cache of movie hashes keyed by file path, size and modification time.
+
+    Args:
+        cache_path (str): The path of the JSON file where the hashes are kept.
+    """
+
+    def __init__(self, cache_path: str):
+        """Initializes a new instance of the MovieHashCache class and loads the existing hashes.
+
+        Args:
+            cache_path (str): The path of the JSON file where the hashes are kept.
+        """
+        self.cache_path = cache_path
+
+        try:
+            with open(cache_path, 'r') as file:
+                self.hashes = json.load(file)
+
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            self.hashes = dict()
+
+    def get(self, file_path: str, size: int, mtime: int) -> str:
+        """Get the cached hash of a file if the file did not change since it was hashed.
+
+        Args:
+            file_path (str): The path of the video file.
+            size (int): The size of the file in bytes.
+            mtime (int): The modification time of the file in nanoseconds.
+
+        Returns:
+            str: The cached hash, or None if the file is not cached or changed.
+        """
+        cached = self.hashes.get(file_path)
+        if cached and cached['size'] == size and cached['mtime'] == mtime:
+            return cached['hash']
+
+        return None
+
+    def set(self, file_path: str, size: int, mtime: int, hash_: str):
+        """Cache the hash of a file.
+
+        Args:
+            file_path (str): The path of the video file.
+            size (int): The size of the file in bytes.
+            mtime (int): The modification time of the file in nanoseconds.
+            hash_ (str): The hash of the file.
+        """
+        self.hashes[file_path] = {'size': size, 'mtime': mtime, 'hash': hash_}
+
+    def save(self):
+        """Write the cached hashes to the JSON file."""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf8') as file:
+            json.dump(self.hashes, file)
+
+def hash_library(root: str, cache_path: str, workers: int = 8) -> list:
+    """Compute the OpenSubtitles hashes of every video file in a directory tree.
+
+    Files whose size and modification time did not change since the last run are taken from the cache,
+    the others are hashed in a thread pool. Files that can not be read are skipped.
+
+    Args:
+        root (str): The folder of the video library.
+        cache_path (str): The path of the JSON file where the hashes are cached.
+        workers (int): The number of threads used to hash the files.
+
+    Returns:
+        list: A search query for each video file, containing its path, hash and size in bytes.
+    """
+    cache = MovieHashCache(cache_path)
+    queries = list()
+    pending = list()
+
+    for file_path in find_videos(root):
+        try:
+            stat = os.stat(file_path)
+        except OSError as error:
+            # e.g. a broken symbolic link
+            print(f'Warning: {file_path} could not be hashed ({error}): passed')
+            continue
+
+        query = {
+            'imdb_id': None,
+            'video_path': file_path,
+            'movie_hash': cache.get(file_path, stat.st_size, stat.st_mtime_ns),
+            'movie_byte_size': stat.st_size
+        }
+        queries.append(query)
+
+        # Hash the files which are not cached
+        if query['movie_hash'] is None:
+            pending.append((query, stat.st_mtime_ns))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(movie_hash, query['video_path']) for query, _ in pending]
+        for (query, mtime), future in zip(pending, futures):
+            try:
+                hash_ = future.result()
+            except OSError as error:
+                print(f"Warning: {query['video_path']} could not be hashed ({error}): passed")
+                hash_ = None
+
+            query['movie_hash'] = hash_
+            if hash_:
+                cache.set(query['video_path'], query['movie_byte_size'], mtime, hash_)
+
+    if pending:
+        cache.save()
+
+    # Files too small to be hashed can not be searched
+    return [query for query in queries if query['movie_hash']]
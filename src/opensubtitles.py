@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
 # import libraries
+import os
 from selenium.webdriver.common.by import By
 
 import src.element_locations as el
 from .main_operations import MainOperations
 from .parsing import ParseResult
+from .moviehash import hash_library
+from .sync_state import SyncState
+from .search_index import SubtitleIndex
+from .verify import VERIFY_RETRIES, check_archive
 
 class OpenSubtitles(MainOperations):
     
@@ -16,15 +21,43 @@ class OpenSubtitles(MainOperations):
             args: A Namespace object that contains command line arguments.
         """
         super().__init__(args)
-    
-    def url(self, imdb_id: str) -> str:
-        """Returns a URL for OpenSubtitles that includes filters for a given IMDb ID.
+        self._queries = None
+        self.sync_state = SyncState(f'{self.process_path}/sync.json') if self.args.incremental else None
+        self.search_index = SubtitleIndex(self.args.search_index_path) if self.args.search_index_path else None
+
+    @property
+    def queries(self) -> list:
+        """Get the search queries of the movies to process.
+
+        If a video library is given, each video file is searched by its OpenSubtitles hash and size,
+        otherwise each movie is searched by its IMDb ID. The hashes are computed once per run and cached
+        in the process folder between runs.
+
+        Returns:
+            list: A dictionary for each movie, containing its imdb_id or its movie_hash, movie_byte_size and video_path.
+        """
+        if self._queries is None:
+            if self.args.video_path:
+                self._queries = hash_library(
+                    root=self.args.video_path,
+                    cache_path=f'{self.process_path}/moviehash.json',
+                    workers=self.args.hash_workers
+                )
+            else:
+                self._queries = [{'imdb_id': imdb_id} for imdb_id in self.args.imdb_id]
+
+        return self._queries
+
+    def url(self, imdb_id: str = None, movie_hash: str = None, movie_byte_size: int = None) -> str:
+        """Returns a URL for OpenSubtitles that includes filters for a given IMDb ID or movie hash.
 
         Args:
             imdb_id (str): An IMDb ID.
+            movie_hash (str): The OpenSubtitles hash of a video file, used instead of the IMDb ID.
+            movie_byte_size (int): The size of the hashed video file in bytes.
 
         Returns:
-            str: A URL for OpenSubtitles that includes filters for the given IMDb ID.
+            str: A URL for OpenSubtitles that includes filters for the given IMDb ID or movie hash.
         """
         base_url = 'https://www.opensubtitles.org/en/search/'
 
@@ -39,6 +72,12 @@ class OpenSubtitles(MainOperations):
             'asc': '0'
         }
 
+        # A hash matches an exact release (movie or episode), so it replaces both the IMDb ID and the movies only filter.
+        # This also keeps the number of URL parameters, which detect_page_type relies on.
+        if movie_hash:
+            del params['searchonlymovies'], params['imdbid']
+            params = {'moviebytesize': movie_byte_size, 'moviehash': movie_hash, **params}
+
         # Merge parameters with the base URL and split them with '/'
         query_string = [f'{key}-{value}' for key, value in params.items()]
         query_string = '/'.join(query_string)
@@ -80,96 +119,347 @@ class OpenSubtitles(MainOperations):
             print('Unexpected page type')
 
     def reset_process(self):
-        with open(f'{self.args.save_process_path}/process.json', 'w') as file:
+        with open(f'{self.args.save_process_path}/{self.process_file}', 'w') as file:
             file.write('')
 
-    def execute(self, counter=0):
-            """
-            Downloads subtitles for the given imdb_id(s) by parsing the corresponding web pages on OpenSubtitles.
-            
-            Args:
-                counter (int): The index of the first imdb_id to process. Default is 0.
-                
-            Returns:
-                None
-                
-            Raises:
-                Exception: If the webdriver cannot be started or if there is an error while downloading or parsing the subtitle.
-            """
-
-            # Check if process restarted
-            if self.args.reset_process:
-                self.reset_process()
-
-            # Check if imdb_id has single element or multiple elements
-            if len(self.args.imdb_id) > 1:
-                # If length is more than 1 it should be continued from last downloaded subtitle
-                # so get the index of last downloaded subtitle and continue from it.
-                downloaded_list = self.last_movie(self.process_path)
-                if downloaded_list:
-                    counter = downloaded_list['index'] + 1
-                else:
-                    counter = 0        
-
-            # Process each imdb_id starting from the given counter
-            for imdb_id in self.args.imdb_id[counter:]:
-                # Launch the web page for the given imdb_id
-                self.driver.get(self.url(imdb_id))
-
-                # Detect the type of page (e.g. movie, TV show, etc.)
-                page_type = self.detect_page_type()
-
-                # Check if the page has a subtitle to download
-                if page_type > 0:
-                    # Parse the page to extract the subtitle information
-                    parsing = ParseResult(
-                        source=self.driver.find_element(By.TAG_NAME, 'html'),
-                        page_type=page_type
-                    )
-
-                    # Add the imdb_id to the parse results
-                    results = parsing.results
-                    results['imdb_id'] = imdb_id
-
-                    # Print the downloading file
-                    print(f"{counter}: {results['imdb_id']} ({results['movie_name']}) (page type: {page_type}) downloading..")
-
-                    # Download the subtitle file
-                    self.download()
-
-                    # Check if CAPTCHA has been detected
-                    if self.detect_captcha():
+    def restart_driver(self):
+        """Quit the browser and start a new one, e.g. after being caught by CAPTCHA."""
+        self.quit_webdriver(self.driver)
+        self.driver = self.webdriver()
+
+    def first_index(self, counter=0) -> int:
+        """Prepare the process file and get the index of the first query to process.
+
+        Args:
+            counter (int): The index of the first query to process for a single query. Default is 0.
+
+        Returns:
+            int: The index of the first query, continuing from the last saved movie for multiple saved queries.
+        """
+        # Create the process file before saving any results (if save_process flag is True)
+        if self.args.save_process:
+            self.create_process_file()
+
+        # Check if process restarted
+        if self.args.reset_process:
+            self.reset_process()
+
+        # Check if queries has single element or multiple elements
+        # and if the process is saved, since an unsaved process can not be continued
+        if len(self.queries) > 1 and self.args.save_process:
+            # If length is more than 1 it should be continued from last downloaded subtitle
+            # so get the index of last downloaded subtitle and continue from it.
+            downloaded_list = self.last_movie(self.process_path, self.process_file)
+            if downloaded_list:
+                counter = downloaded_list['index'] + 1
+            else:
+                counter = 0
+
+        return counter
+
+    def pending_items(self, counter=0) -> list:
+        """Prepare the process file and get the queries left to process.
+
+        IMDb IDs continue from the index of the last saved movie. A library is walked again on every run, so files
+        added or removed in between shift the indexes; its queries continue from the video files not saved yet instead.
+
+        Args:
+            counter (int): The index of the first query to process for a single query. Default is 0.
+
+        Returns:
+            list: The index and search query of each movie to process, in order.
+        """
+        counter = self.first_index(counter)
+
+        if self.args.video_path:
+            saved = self.saved_video_paths(self.process_path, self.process_file) if self.args.save_process else set()
+            return [(index, query) for index, query in enumerate(self.queries) if query['video_path'] not in saved]
+
+        return [(index, self.queries[index]) for index in range(counter, len(self.queries))]
+
+    def search(self, query: dict) -> dict:
+        """Search the subtitles of a movie, parse the first result and click its download button.
+
+        Args:
+            query (dict): The search query, containing an imdb_id or a movie_hash and movie_byte_size.
+
+        Returns:
+            dict: A record of the movie containing its name, query, page type, parse results and status. The status is
+            'not_found' if there is no subtitle, 'unchanged' if the newest subtitle was downloaded on a previous run,
+            'parsed' in metadata only mode, 'captcha' if the download was caught by CAPTCHA and 'downloading' otherwise.
+        """
+        # Movies searched by hash are named after their hash
+        record = {
+            'name': query['imdb_id'] or query['movie_hash'],
+            'query': query,
+            'page_type': None,
+            'results': None,
+            'file_path': None
+        }
+
+        # Launch the web page for the given query
+        self.driver.get(self.url(query['imdb_id'], query.get('movie_hash'), query.get('movie_byte_size')))
+
+        # Detect the type of page (e.g. movie, TV show, etc.)
+        record['page_type'] = page_type = self.detect_page_type()
+
+        # Check if the page has a subtitle to download
+        if not page_type or page_type < 0:
+            record['status'] = 'not_found'
+            return record
+
+        # Parse the page to extract the subtitle information
+        parsing = ParseResult(
+            source=self.driver.find_element(By.TAG_NAME, 'html'),
+            page_type=page_type
+        )
+
+        # Skip the movie if its newest subtitle was downloaded on a previous run (if incremental flag is True),
+        # the subtitle ID and upload datetime are cached by ParseResult, so the results do not read them again
+        if self.sync_state and self.sync_state.unchanged(record['name'], self.args.language, parsing.subtitle_id, parsing.upload_datetime):
+            record['status'] = 'unchanged'
+            return record
+
+        # Add the query (imdb_id or movie hash) to the parse results
+        record['results'] = results = parsing.results
+        results.update(query)
+
+        # Only keep the parse results without downloading (if metadata_only flag is True)
+        if self.args.metadata_only:
+            record['status'] = 'parsed'
+            return record
+
+        # Point the browser to the download folder of the movie and download the subtitle file
+        self.set_download_folder(record['name'])
+        self.download()
+
+        # Check if CAPTCHA has been detected
+        record['status'] = 'captcha' if self.detect_captcha() else 'downloading'
+        return record
+
+    def finish_download(self, record: dict) -> dict:
+        """Wait for the download of a movie and rename its file, depending on the command line arguments.
+
+        Args:
+            record (dict): The record returned by search.
+
+        Returns:
+            dict: The record, with the path of the downloaded file if it is known.
+        """
+        if record['status'] != 'downloading':
+            return record
+
+        subtitle_id = record['results']['subtitle_id']
+
+        # Wait until the download is complete (if safe_downloading flag is True)
+        if self.args.safe_downloading:
+            self.wait_while_downloading(subtitle_id, record['name'])
+
+        # Change the subtitle file name (if change_file_names flag is True)
+        if self.args.change_file_names:
+            self.change_file_name(subtitle_id, record['name'])
+
+        record['file_path'] = self.download_index.get(subtitle_id)
+        record['status'] = 'downloaded'
+        return record
+
+    def flag_download(self, record: dict, error: str, read_error: str = None) -> dict:
+        """Flag a downloaded archive found corrupt by check_archive, deleting it so it can be downloaded again.
+
+        Args:
+            record (dict): The record returned by finish_download.
+            error (str): The reason why the archive is corrupt, or None if it is valid.
+            read_error (str): The error of reading the file, or None if it was read. The file is then kept as downloaded.
+
+        Returns:
+            dict: The record, with the 'corrupt' status and the reason in verification if the archive is corrupt.
+        """
+        if read_error:
+            print(f"Warning: {record['file_path']} could not be checked ({read_error}): passed")
+
+        elif error:
+            if os.path.exists(record['file_path']):
+                os.remove(record['file_path'])
+
+            record['status'] = 'corrupt'
+            record['verification'] = error
+            record['file_path'] = None
+
+        return record
+
+    def verify_download(self, record: dict) -> dict:
+        """Check the downloaded archive of a movie (if verify_downloads flag is True and the file path is known).
+
+        Args:
+            record (dict): The record returned by finish_download.
+
+        Returns:
+            dict: The record, flagged if the archive is corrupt.
+        """
+        if self.args.verify_downloads and record['status'] == 'downloaded' and record['file_path']:
+            return self.flag_download(record, *check_archive(record['file_path']))
+
+        return record
+
+    def forget_downloads(self, items: list):
+        """Drop the sync state of movies queued to be downloaded again (if incremental flag is True),
+        so their corrupt archives are not skipped as unchanged.
+
+        Args:
+            items (list): The index and search query of each movie to download again.
+        """
+        if self.sync_state:
+            for _, query in items:
+                self.sync_state.remove(query.get('imdb_id') or query.get('movie_hash'), self.args.language)
+
+    def report(self, record: dict, index: int):
+        """Print the outcome of a movie.
+
+        Args:
+            record (dict): The record returned by search or finish_download.
+            index (int): The index of the query of the movie.
+        """
+        name, results = record['name'], record['results']
+
+        if record['status'] == 'not_found':
+            print(f'There is no subtitle for {name}: passed')
+
+        elif record['status'] == 'unchanged':
+            print(f'{index}: {name} has no new subtitle: passed')
+
+        elif record['status'] == 'corrupt':
+            print(f"Warning: {index}: {name} download is corrupt ({record['verification']})")
+
+        else:
+            print(f"{index}: {name} ({results['movie_name']}) (page type: {record['page_type']}) {record['status']}")
+
+    def store(self, record: dict, index: int):
+        """Save the outcome of a movie to process.json, the sync state and the full-text index.
+
+        Args:
+            record (dict): The record returned by search or finish_download.
+            index (int): The index of the query of the movie.
+        """
+        name, results = record['name'], record['results']
+
+        if record['status'] == 'not_found':
+            # If no subtitle found for the imdb_id, log it as an error
+            data = {
+                'index': index,
+                'download_status': False,
+                'parsing_results': name
+            }
+
+            # Keep the video file of a library, so it is not searched again when the run is continued
+            if record['query'].get('video_path'):
+                data['video_path'] = record['query']['video_path']
+
+            self.save_process(data=data)
+
+        elif record['status'] == 'corrupt':
+            # Flag the corrupt download, so it is downloaded again
+            data = {
+                'index': index,
+                'download_status': False,
+                'verification': record['verification'],
+                'parsing_results': results
+            }
+            self.save_process(data=data)
+
+        elif record['status'] == 'parsed':
+            data = {
+                'index': index,
+                'download_status': False,
+                'metadata_only': True,
+                'parsing_results': results
+            }
+            self.save_process(data=data)
+
+        elif record['status'] == 'downloaded':
+            # Save the process to process.json (if save_process flag is True)
+            data = {
+                'index': index,
+                'download_status': True,
+                'file_path': record['file_path'],
+                'parsing_results': results
+            }
+            self.save_process(data=data)
+
+            # Remember the downloaded subtitle for the next run (if incremental flag is True),
+            # only once its file is found, so failed downloads are tried again
+            if self.sync_state and record['file_path']:
+                self.sync_state.update(name, self.args.language, results['subtitle_id'], results['upload_datetime'])
+
+            # Add the downloaded subtitle to the full-text index (if search_index_path is given)
+            if self.search_index and record['file_path']:
+                self.search_index.add(name, results['subtitle_id'], record['file_path'])
+
+    def stream(self, counter=0, items=None):
+        """
+        Process the queries one by one, yielding each movie as soon as it is stored.
+
+        Args:
+            counter (int): The index of the first query to process. Default is 0.
+            items (list): The index and search query of each movie to process, instead of the queries
+                continued from the saved process (e.g. to download corrupt archives again). Their sync state is dropped.
+
+        Yields:
+            tuple: The index of the query and the record of the movie.
+        """
+        if items is None:
+            items = self.pending_items(counter)
+        else:
+            self.forget_downloads(items)
+
+        try:
+            # Process each query starting from the given counter
+            for index, query in items:
+                retries = 0
+                while True:
+                    record = self.search(query)
+
+                    # Restart the browser and retry the same movie if CAPTCHA has been detected
+                    if record['status'] == 'captcha':
                         print('Warning: Caught by CAPTCHA. Restarting..')
-                        self.driver.quit()
-                        self.execute(counter=counter)
-
-                    # If CAPTCHA is not detected, continue processing the subtitle
-                    else:
-                        # Wait until the download is complete (if safe_downloading flag is True)
-                        if self.args.safe_downloading:
-                            self.wait_while_downloading(results['subtitle_id'])
-
-                        # Change the subtitle file name (if change_file_names flag is True)
-                        if self.args.change_file_names:
-                            self.change_file_name(results['subtitle_id'], results['imdb_id'])
-
-                        # Save the process to process.json (if save_process flag is True)
-                        if self.args.save_process:
-                            data = {
-                                'index': counter,
-                                'download_status': True,
-                                'parsing_results': results
-                            }
-                            self.save_process(data=data)
-
-                # If no subtitle found for the imdb_id, log it as an error
-                else:
-                    print(f'There is no subtitle for {imdb_id}: passed')
-                    data = {
-                        'index': counter,
-                        'download_status': False,
-                        'parsing_results': imdb_id
-                    }
-                    self.save_process(data=data)
-
-                counter += 1
\ No newline at end of file
+                        self.restart_driver()
+                        continue
+
+                    self.finish_download(record)
+                    self.verify_download(record)
+                    self.store(record, index)
+                    yield index, record
+
+                    # Download the movie again if its archive is corrupt
+                    if record['status'] == 'corrupt' and retries < VERIFY_RETRIES:
+                        retries += 1
+                        continue
+
+                    break
+
+        finally:
+            # Write the remaining updates of the sync state
+            if self.sync_state:
+                self.sync_state.flush()
+
+    def execute(self, counter=0, items=None):
+        """
+        Downloads subtitles for the given queries by parsing the corresponding web pages on OpenSubtitles,
+        then closes the browser.
+
+        Args:
+            counter (int): The index of the first query to process. Default is 0.
+            items (list): The index and search query of each movie to process, instead of the queries
+                continued from the saved process.
+
+        Returns:
+            None
+
+        Raises:
+            Exception: If the webdriver cannot be started or if there is an error while downloading or parsing the subtitle.
+        """
+        try:
+            for index, record in self.stream(counter, items):
+                self.report(record, index)
+
+        finally:
+            self.quit_webdriver(self.driver)
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 # import libraries
+from functools import cached_property
+
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 
@@ -140,7 +142,8 @@ class ParseResult:
             'foreign_parts_only': find_feature('Foreign Parts Only')
         }
 
-    @property
+    # cached, since it is read for the incremental check before the results
+    @cached_property
     @handle_no_such_element
     def upload_datetime(self) -> str:
         """Gets the upload datetime in ISO 8601 format.
@@ -205,7 +208,8 @@ class ParseResult:
         else:
             return None
 
-    @property
+    # cached, since it is read for the incremental check before the results
+    @cached_property
     @handle_no_such_element
     def download_link(self) -> str:
         """Get download link of subtitle
@@ -222,7 +226,8 @@ class ParseResult:
         else:
             return None
 
-    @property
+    # cached, since it is read for the incremental check before the results
+    @cached_property
     @handle_no_such_element
     def subtitle_id(self) -> str:
         """Get the unique ID of the subtitle.
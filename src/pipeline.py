@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+# import libraries
+import heapq
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .opensubtitles import OpenSubtitles
+from .verify import VERIFY_RETRIES, check_archive
+
+class Pipeline:
+    """An asyncio engine running the search, download and store stages of OpenSubtitles concurrently.
+
+    Each stage has its own number of workers and is connected to the next one by a bounded queue, so a slow
+    stage holds back the previous ones instead of piling up work. Selenium and file operations are blocking,
+    so they run in executor threads:
+
+        search:   one worker per browser, navigating, parsing and clicking the download button
+        download: waiting for the downloaded files, renaming them and checking them in a process pool
+        store:    a single worker saving the results to process.json and the sync state in query order
+
+    Movies whose archive is corrupt are downloaded again in a later round, at most VERIFY_RETRIES times.
+
+    Args:
+        args: A Namespace object containing command line arguments parsed by argparse in subscraper.py.
+    """
+
+    def __init__(self, args):
+        """Initializes a new instance of the Pipeline class and starts one browser per search worker.
+
+        Args:
+            args: A Namespace object containing command line arguments parsed by argparse in subscraper.py.
+
+        Raises:
+            ValueError: If there is less than one browser or download worker.
+        """
+        if args.browsers < 1 or args.download_workers < 1:
+            raise ValueError('The pipeline needs at least one browser and one download worker')
+
+        self.args = args
+
+        # The first instance owns the queries, process file, sync state and search index, the others share them
+        self.workers = [OpenSubtitles(args) for _ in range(args.browsers)]
+        self.main = self.workers[0]
+        for worker in self.workers[1:]:
+            worker._queries = self.main.queries
+            worker.sync_state = self.main.sync_state
+            worker.search_index = self.main.search_index
+
+        self.executor = ThreadPoolExecutor(max_workers=len(self.workers) + args.download_workers + 1)
+        self.process_pool = ProcessPoolExecutor(max_workers=args.verify_workers) if args.verify_downloads else None
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking function in the executor threads.
+
+        Args:
+            func: The function to run.
+            *args: The arguments of the function.
+
+        Returns:
+            The return value of the function.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def feed(self, items: list, search_queue: asyncio.Queue):
+        """Put the queries to process in the search queue, followed by one stop signal per search worker.
+
+        Args:
+            items (list): The index and search query of each movie to process.
+            search_queue (asyncio.Queue): The queue of the search stage.
+        """
+        for item in items:
+            await search_queue.put(item)
+
+        for _ in self.workers:
+            await search_queue.put(None)
+
+    async def search_stage(self, worker: OpenSubtitles, search_queue: asyncio.Queue, download_queue: asyncio.Queue):
+        """Search the queries with the browser of a worker and pass the records to the download stage.
+
+        Before the browser is restarted for CAPTCHA, the downloads it already started are waited for.
+
+        Args:
+            worker (OpenSubtitles): The worker whose browser is used.
+            search_queue (asyncio.Queue): The queue of the search stage.
+            download_queue (asyncio.Queue): The queue of the download stage.
+        """
+        # The downloads of the worker which are not finished yet
+        outstanding = list()
+
+        while (item := await search_queue.get()) is not None:
+            index, query = item
+            record = await self.run_blocking(worker.search, query)
+
+            # Restart the browser and retry the same movie if CAPTCHA has been detected
+            while record['status'] == 'captcha':
+                print('Warning: Caught by CAPTCHA. Restarting..')
+
+                # Quitting the browser cancels its downloads, so wait for the ones passed to the download stage
+                await asyncio.gather(*outstanding)
+                await self.run_blocking(worker.restart_driver)
+                record = await self.run_blocking(worker.search, query)
+
+            finished = asyncio.get_running_loop().create_future()
+            outstanding = [future for future in outstanding if not future.done()] + [finished]
+            await download_queue.put((index, worker, record, finished))
+
+    async def download_stage(self, download_queue: asyncio.Queue, store_queue: asyncio.Queue):
+        """Wait for the downloads and rename their files, then pass the records to the store stage.
+
+        Args:
+            download_queue (asyncio.Queue): The queue of the download stage.
+            store_queue (asyncio.Queue): The queue of the store stage.
+        """
+        while (item := await download_queue.get()) is not None:
+            index, worker, record, finished = item
+            try:
+                record = await self.run_blocking(worker.finish_download, record)
+
+            finally:
+                # Let the search worker restart its browser
+                finished.set_result(None)
+
+            # Check the downloaded archive in the process pool (if verify_downloads flag is True)
+            if self.process_pool and record['status'] == 'downloaded' and record['file_path']:
+                errors = await asyncio.get_running_loop().run_in_executor(self.process_pool, check_archive, record['file_path'])
+                record = await self.run_blocking(worker.flag_download, record, *errors)
+
+            await store_queue.put((index, record))
+
+    async def store_stage(self, items: list, store_queue: asyncio.Queue, output_queue: asyncio.Queue):
+        """Save the records in query order, so that process.json can still be resumed from its last index,
+        then pass them to the output queue.
+
+        Args:
+            items (list): The index and search query of each movie to process, in order.
+            store_queue (asyncio.Queue): The queue of the store stage.
+            output_queue (asyncio.Queue): The queue of the stored records.
+        """
+        order = iter([index for index, _ in items])
+        expected = next(order, None)
+        waiting = list()
+
+        while (item := await store_queue.get()) is not None:
+            heapq.heappush(waiting, item)
+
+            # Store every record whose previous records are stored
+            while waiting and waiting[0][0] == expected:
+                index, record = heapq.heappop(waiting)
+                await self.run_blocking(self.main.store, record, index)
+                await output_queue.put((index, record))
+                expected = next(order, None)
+
+    async def stop_stages(self, feeder, searchers: list, downloaders: list, storer, download_queue: asyncio.Queue, store_queue: asyncio.Queue):
+        """Stop each stage once the previous stage is finished.
+
+        Args:
+            feeder: The task of the feeder.
+            searchers (list): The tasks of the search stage.
+            downloaders (list): The tasks of the download stage.
+            storer: The task of the store stage.
+            download_queue (asyncio.Queue): The queue of the download stage.
+            store_queue (asyncio.Queue): The queue of the store stage.
+        """
+        await asyncio.gather(feeder, *searchers)
+        for _ in downloaders:
+            await download_queue.put(None)
+
+        await asyncio.gather(*downloaders)
+        await store_queue.put(None)
+        await storer
+
+    async def run_stages(self, items: list, output_queue: asyncio.Queue):
+        """Run all stages until every query is processed, then put a stop signal in the output queue.
+
+        Every stage is watched, so if one of them fails the others are cancelled instead of waiting for it
+        forever, and the error is raised.
+
+        Args:
+            items (list): The index and search query of each movie to process, in order.
+            output_queue (asyncio.Queue): The queue of the stored records.
+        """
+        search_queue = asyncio.Queue(maxsize=len(self.workers) * 2)
+        download_queue = asyncio.Queue(maxsize=self.args.download_workers * 2)
+        store_queue = asyncio.Queue(maxsize=self.args.download_workers * 2)
+
+        feeder = asyncio.create_task(self.feed(items, search_queue))
+        searchers = [asyncio.create_task(self.search_stage(worker, search_queue, download_queue)) for worker in self.workers]
+        downloaders = [asyncio.create_task(self.download_stage(download_queue, store_queue)) for _ in range(self.args.download_workers)]
+        storer = asyncio.create_task(self.store_stage(items, store_queue, output_queue))
+        stopper = asyncio.create_task(self.stop_stages(feeder, searchers, downloaders, storer, download_queue, store_queue))
+        tasks = [feeder, *searchers, *downloaders, storer, stopper]
+
+        try:
+            # Return once every stage is finished, or as soon as one of them fails
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+
+        except asyncio.CancelledError:
+            # The stream is closed, so nobody is waiting for the stop signal
+            await self.cancel_tasks(tasks)
+            raise
+
+        errors = [task.exception() for task in tasks if task.done() and not task.cancelled() and task.exception()]
+        if errors:
+            # Stop the stream, which raises the error when it awaits this task
+            await self.cancel_tasks(tasks)
+            await output_queue.put(None)
+            raise errors[0]
+
+        await output_queue.put(None)
+
+    @staticmethod
+    async def cancel_tasks(tasks: list):
+        """Cancel tasks and wait for them to stop.
+
+        Args:
+            tasks (list): The tasks to cancel.
+        """
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stream(self, items: list = None):
+        """Process the queries through the pipeline, yielding each movie as soon as it is stored.
+
+        Args:
+            items (list): The index and search query of each movie to process, instead of the queries
+                continued from the saved process (e.g. to download corrupt archives again). Their sync state is dropped.
+
+        Yields:
+            tuple: The index of the query and the record of the movie.
+        """
+        if items is None:
+            items = await self.run_blocking(self.main.pending_items)
+        else:
+            await self.run_blocking(self.main.forget_downloads, items)
+
+        stages = None
+        try:
+            for _ in range(VERIFY_RETRIES + 1):
+                output_queue = asyncio.Queue(maxsize=self.args.download_workers * 2)
+                stages = asyncio.create_task(self.run_stages(items, output_queue))
+                corrupt = list()
+
+                while (item := await output_queue.get()) is not None:
+                    if item[1]['status'] == 'corrupt':
+                        corrupt.append((item[0], item[1]['query']))
+                    yield item
+
+                # Raise the error of a failed stage, if any
+                await stages
+
+                # Download the corrupt archives again in the next round
+                items = corrupt
+                if not items:
+                    break
+
+        finally:
+            # Wait for the cancelled stages, so nothing runs in the executor once the stream is closed
+            if stages:
+                stages.cancel()
+                try:
+                    await stages
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+            # Write the remaining updates of the sync state
+            if self.main.sync_state:
+                await self.run_blocking(self.main.sync_state.flush)
+
+    async def report(self, items: list = None):
+        """Print the outcome of each movie processed by the pipeline.
+
+        Args:
+            items (list): The index and search query of each movie to process, see stream.
+        """
+        async for index, record in self.stream(items):
+            self.main.report(record, index)
+
+    def close(self):
+        """Stop the executor threads and close the browsers."""
+        self.executor.shutdown()
+        if self.process_pool:
+            self.process_pool.shutdown()
+
+        for worker in self.workers:
+            worker.quit_webdriver(worker.driver)
+
+    def execute(self, items: list = None):
+        """
+        Downloads subtitles for the given queries through the pipeline, then closes the browsers.
+
+        Args:
+            items (list): The index and search query of each movie to process, instead of the queries
+                continued from the saved process.
+
+        Returns:
+            None
+        """
+        try:
+            asyncio.run(self.report(items))
+
+        finally:
+            self.close()
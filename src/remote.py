@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# import libraries
+import json
+import threading
+from time import monotonic
+from urllib.request import urlopen
+
+# Seconds after which the health of an endpoint is checked again
+HEALTH_CHECK_INTERVAL = 30
+
+# Seconds to wait for the status of an endpoint
+HEALTH_CHECK_TIMEOUT = 5
+
+# Seconds to wait for a free session before giving up
+ACQUIRE_TIMEOUT = 300
+
+class Endpoint:
+    """A remote WebDriver endpoint, e.g. a Selenium Grid or a chromedriver started with --port.
+
+    Args:
+        url (str): The URL of the endpoint.
+        max_sessions (int): The maximum number of sessions opened on the endpoint at the same time.
+    """
+
+    def __init__(self, url: str, max_sessions: int):
+        """Initializes a new instance of the Endpoint class.
+
+        Args:
+            url (str): The URL of the endpoint.
+            max_sessions (int): The maximum number of sessions opened on the endpoint at the same time.
+        """
+        self.url = url.rstrip('/')
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.healthy = True
+        self.checked_at = None
+
+    @property
+    def load(self) -> float:
+        """The share of the sessions of the endpoint in use."""
+        return self.sessions / self.max_sessions
+
+    def check(self) -> bool:
+        """Check if the endpoint is ready for new sessions through its /status route, which both Selenium Grid and
+        chromedriver provide.
+
+        Returns:
+            bool: True if the endpoint is ready, False otherwise.
+        """
+        try:
+            with urlopen(f'{self.url}/status', timeout=HEALTH_CHECK_TIMEOUT) as response:
+                self.healthy = bool(json.load(response)['value']['ready'])
+
+        except Exception:
+            self.healthy = False
+
+        self.checked_at = monotonic()
+        return self.healthy
+
+class EndpointPool:
+    """Spreads WebDriver sessions over remote endpoints, giving each new session to the least loaded healthy endpoint.
+
+    Pools are shared by every Driver of the process through EndpointPool.shared, so the session limits hold
+    across the browsers of a pipeline.
+
+    Args:
+        endpoints (list): The endpoints of the pool.
+    """
+
+    _pools = dict()
+    _pools_lock = threading.Lock()
+
+    def __init__(self, endpoints: list):
+        """Initializes a new instance of the EndpointPool class.
+
+        Args:
+            endpoints (list): The endpoints of the pool.
+        """
+        self.endpoints = endpoints
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def parse(urls: list, max_sessions: int) -> list:
+        """Create endpoints from URLs, which can end with =N to set their own session limit.
+
+        URLs with a query string are kept as they are, since their last parameter may end with =N too.
+
+        Args:
+            urls (list): The URLs of the endpoints, e.g. ['http://grid:4444', 'http://node:9515=2'].
+            max_sessions (int): The session limit of the endpoints without their own limit.
+
+        Returns:
+            list: The endpoints.
+        """
+        endpoints = list()
+        for url in urls:
+            base, _, limit = url.rpartition('=')
+            if base and '?' not in base and limit.isdigit():
+                endpoints.append(Endpoint(base, int(limit)))
+            else:
+                endpoints.append(Endpoint(url, max_sessions))
+
+        return endpoints
+
+    @classmethod
+    def shared(cls, urls: list, max_sessions: int) -> 'EndpointPool':
+        """Get the pool of the given endpoints, creating it on first use.
+
+        Args:
+            urls (list): The URLs of the endpoints.
+            max_sessions (int): The session limit of the endpoints without their own limit.
+
+        Returns:
+            EndpointPool: The pool shared by the process.
+        """
+        key = (tuple(urls), max_sessions)
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(cls.parse(urls, max_sessions))
+
+            return cls._pools[key]
+
+    def needs_check(self, endpoint: Endpoint) -> bool:
+        """Check if the health of an endpoint must be asked again, because its last check is too old.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+
+        Returns:
+            bool: True if the endpoint must be checked, False otherwise.
+        """
+        return endpoint.checked_at is None or monotonic() - endpoint.checked_at > HEALTH_CHECK_INTERVAL
+
+    def acquire(self, timeout: float = ACQUIRE_TIMEOUT) -> Endpoint:
+        """Reserve a session on the least loaded healthy endpoint, waiting for one to be released if all are full.
+
+        Endpoints are checked without holding the lock of the pool, so a slow endpoint does not block the
+        other browsers acquiring or releasing their sessions.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            Endpoint: The endpoint where the session can be opened.
+
+        Raises:
+            RuntimeError: If no endpoint has a free session before the timeout.
+        """
+        deadline = monotonic() + timeout
+
+        while True:
+            # Claim the endpoints to check, so other browsers do not check them at the same time
+            with self.condition:
+                stale = [endpoint for endpoint in self.endpoints if self.needs_check(endpoint)]
+                for endpoint in stale:
+                    endpoint.checked_at = monotonic()
+
+            for endpoint in stale:
+                endpoint.check()
+
+            with self.condition:
+                candidates = [endpoint for endpoint in self.endpoints if endpoint.sessions < endpoint.max_sessions and endpoint.healthy]
+                if candidates:
+                    endpoint = min(candidates, key=lambda endpoint: endpoint.load)
+                    endpoint.sessions += 1
+                    return endpoint
+
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise RuntimeError('No remote WebDriver endpoint has a free session')
+
+                # Wake up for released sessions, or to check unhealthy endpoints again
+                self.condition.wait(min(remaining, HEALTH_CHECK_INTERVAL))
+
+    def release(self, endpoint: Endpoint, failed: bool = False):
+        """Free a session reserved with acquire.
+
+        Args:
+            endpoint (Endpoint): The endpoint of the session.
+            failed (bool): True if the session could not be opened, which marks the endpoint as unhealthy until its next check.
+        """
+        with self.condition:
+            endpoint.sessions -= 1
+            if failed:
+                endpoint.healthy = False
+                endpoint.checked_at = monotonic()
+
+            self.condition.notify()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# import libraries
+import os
+import re
+import json
+import hashlib
+import sqlite3
+
+from .cues import Cues, read_subtitle
+
+# Formatting tags of subtitles, e.g. <i>, </font> or {\an8}
+TAGS = re.compile(r'<[^>]*>|\{[^}]*\}')
+WORD = re.compile(r'\w+')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (imdb_id TEXT PRIMARY KEY, subtitle_id TEXT, file_path TEXT);
+CREATE TABLE IF NOT EXISTS cues (imdb_id TEXT, cue INTEGER, start INTEGER, end INTEGER, text TEXT, PRIMARY KEY (imdb_id, cue)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (token TEXT, imdb_id TEXT, cue INTEGER, PRIMARY KEY (token, imdb_id, cue)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_imdb_id ON postings (imdb_id);
+'''
+
+def tokenize(text: str) -> list:
+    """Split a subtitle text into lowercase words, ignoring formatting tags.
+
+    Args:
+        text (str): The text of a cue or a query.
+
+    Returns:
+        list: The words of the text, without duplicates, in order of appearance.
+    """
+    return list(dict.fromkeys(WORD.findall(TAGS.sub(' ', text).lower())))
+
+class SubtitleIndex:
+    """An on-disk inverted index over the texts of downloaded subtitles, stored in SQLite.
+
+    The postings map each word to the IMDb IDs and cue indexes where it appears, and the cues keep their
+    timings and text so matches are returned without reading the subtitle files. Movies are indexed one
+    by one as they are downloaded, or from the new records of process.json, so the downloaded files are
+    never rescanned.
+
+    Args:
+        index_path (str): The path of the SQLite file of the index.
+    """
+
+    def __init__(self, index_path: str):
+        """Initializes a new instance of the SubtitleIndex class, creating the index if it does not exist.
+
+        Args:
+            index_path (str): The path of the SQLite file of the index.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+        # The pipeline stores movies from executor threads, one at a time
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Close the index."""
+        self.connection.close()
+
+    def add(self, imdb_id: str, subtitle_id: str, file_path: str) -> bool:
+        """Index the subtitle of a movie, replacing the previous subtitle of the movie if there is one.
+
+        Args:
+            imdb_id (str): The IMDb ID (or hash) of the movie.
+            subtitle_id (str): The ID of the subtitle.
+            file_path (str): The path of the downloaded .srt or .zip file.
+
+        Returns:
+            bool: True if the subtitle was indexed, False if it was already indexed or could not be read.
+        """
+        row = self.connection.execute('SELECT subtitle_id FROM documents WHERE imdb_id = ?', (imdb_id,)).fetchone()
+        if row and row[0] == subtitle_id:
+            return False
+
+        try:
+            data = read_subtitle(file_path)
+        except Exception as error:
+            print(f'Warning: {imdb_id} could not be indexed ({error}): passed')
+            return False
+
+        if data is None:
+            return False
+
+        cues = Cues.parse(data)
+        cue_rows, posting_rows = list(), list()
+        for index in range(len(cues)):
+            start, end, text = cues.cue(index)
+            cue_rows.append((imdb_id, index, start, end, text))
+            posting_rows.extend((token, imdb_id, index) for token in tokenize(text))
+
+        with self.connection:
+            for table in ('documents', 'cues', 'postings'):
+                self.connection.execute(f'DELETE FROM {table} WHERE imdb_id = ?', (imdb_id,))
+
+            self.connection.execute('INSERT INTO documents VALUES (?, ?, ?)', (imdb_id, subtitle_id, file_path))
+            self.connection.executemany('INSERT INTO cues VALUES (?, ?, ?, ?, ?)', cue_rows)
+            self.connection.executemany('INSERT INTO postings VALUES (?, ?, ?)', posting_rows)
+
+        return True
+
+    @staticmethod
+    def fingerprint(records: list) -> str:
+        """Get a fingerprint of process records, to know if the records already read are still the same.
+
+        Args:
+            records (list): The process records.
+
+        Returns:
+            str: The SHA-1 hash of the records.
+        """
+        return hashlib.sha1(json.dumps(records, sort_keys=True).encode()).hexdigest()
+
+    def update(self, process_path: str) -> int:
+        """Index the downloads saved in process.json since the last update.
+
+        The number and a fingerprint of the process records already read are kept in the index, so only the new
+        records are indexed. If these records changed (e.g. process.json was reset), it is read from the beginning.
+
+        Args:
+            process_path (str): The path to the folder where the process data is stored.
+
+        Returns:
+            int: The number of indexed subtitles.
+        """
+        try:
+            with open(f'{process_path}/process.json', 'r') as file:
+                records = json.load(file)
+
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            records = list()
+
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'process_records'").fetchone()
+        read, _, fingerprint = str(row[0]).partition(':') if row else ('', '', '')
+        start = int(read) if read.isdigit() and int(read) <= len(records) else 0
+        if start and self.fingerprint(records[:start]) != fingerprint:
+            start = 0
+
+        count = 0
+        for data in records[start:]:
+            if data['download_status'] and data.get('file_path'):
+                results = data['parsing_results']
+                count += self.add(results['imdb_id'] or results['movie_hash'], results['subtitle_id'], data['file_path'])
+
+        with self.connection:
+            value = f'{len(records)}:{self.fingerprint(records)}'
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('process_records', ?)", (value,))
+
+        return count
+
+    def search(self, query: str, limit: int = 100) -> list:
+        """Find the cues containing every word of a query.
+
+        Args:
+            query (str): The words to search.
+            limit (int): The maximum number of cues to return.
+
+        Returns:
+            list: A dictionary for each matching cue, containing its imdb_id, cue index, start and end time in
+            milliseconds and text, ordered by IMDb ID and time.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return list()
+
+        # Intersect the postings of every word
+        matches = ' INTERSECT '.join(['SELECT imdb_id, cue FROM postings WHERE token = ?'] * len(tokens))
+        rows = self.connection.execute(
+            f'SELECT c.imdb_id, c.cue, c.start, c.end, c.text FROM ({matches}) AS m '
+            f'JOIN cues AS c ON c.imdb_id = m.imdb_id AND c.cue = m.cue '
+            f'ORDER BY c.imdb_id, c.cue LIMIT ?',
+            (*tokens, limit)
+        )
+
+        return [dict(zip(('imdb_id', 'cue', 'start', 'end', 'text'), row)) for row in rows]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# import libraries
+import os
+import json
+
+# Number of updates kept in memory before the state is written to disk
+SYNC_STATE_FLUSH = 50
+
+class SyncState:
+    """The last downloaded subtitle of each movie and language, used to skip unchanged movies on later runs.
+
+    The state is kept in a JSON file of the form {language: {imdb_id: {subtitle_id, upload_datetime}}}.
+    It is loaded once and written every SYNC_STATE_FLUSH updates, so large catalogues are not rewritten
+    after every movie. Updates lost on a crash only cause the movies to be downloaded again.
+
+    Args:
+        state_path (str): The path of the JSON file where the state is kept.
+    """
+
+    def __init__(self, state_path: str):
+        """Initializes a new instance of the SyncState class and loads the existing state.
+
+        Args:
+            state_path (str): The path of the JSON file where the state is kept.
+        """
+        self.state_path = state_path
+        self.pending = 0
+
+        try:
+            with open(state_path, 'r') as file:
+                self.state = json.load(file)
+
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            self.state = dict()
+
+    def unchanged(self, imdb_id: str, language: str, subtitle_id: str, upload_datetime: str) -> bool:
+        """Check if the newest subtitle of a movie is the one downloaded on the last run.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie.
+            language (str): The language of the subtitle.
+            subtitle_id (str): The ID of the newest subtitle on the search page.
+            upload_datetime (str): The upload datetime of the newest subtitle on the search page.
+
+        Returns:
+            bool: True if the subtitle was already downloaded, False otherwise.
+        """
+        known = self.state.get(language, dict()).get(imdb_id)
+        if known is None or subtitle_id is None:
+            return False
+
+        return known['subtitle_id'] == subtitle_id and known['upload_datetime'] == upload_datetime
+
+    def update(self, imdb_id: str, language: str, subtitle_id: str, upload_datetime: str):
+        """Record the subtitle downloaded for a movie.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie.
+            language (str): The language of the subtitle.
+            subtitle_id (str): The ID of the downloaded subtitle.
+            upload_datetime (str): The upload datetime of the downloaded subtitle.
+        """
+        self.state.setdefault(language, dict())[imdb_id] = {
+            'subtitle_id': subtitle_id,
+            'upload_datetime': upload_datetime
+        }
+
+        self.pending += 1
+        if self.pending >= SYNC_STATE_FLUSH:
+            self.flush()
+
+    def remove(self, imdb_id: str, language: str):
+        """Forget the subtitle downloaded for a movie, so it is downloaded again even if it is unchanged.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie.
+            language (str): The language of the subtitle.
+        """
+        if self.state.get(language, dict()).pop(imdb_id, None) is None:
+            return
+
+        self.pending += 1
+        if self.pending >= SYNC_STATE_FLUSH:
+            self.flush()
+
+    def flush(self):
+        """Write the state to the JSON file if it has unsaved updates."""
+        if self.pending == 0:
+            return
+
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+
+        # Write to a temporary file first, so an interrupted write does not lose the whole state
+        with open(f'{self.state_path}.tmp', 'w', encoding='utf8') as file:
+            json.dump(self.state, file)
+
+        os.replace(f'{self.state_path}.tmp', self.state_path)
+        self.pending = 0
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# import libraries
+import os
+import zlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of times a movie is downloaded again after a corrupt download
+VERIFY_RETRIES = 2
+
+def verify_archive(file_path: str) -> str:
+    """Check that a downloaded archive is complete, by reading its central directory and the CRC of every member.
+
+    Args:
+        file_path (str): The path of the downloaded .zip file.
+
+    Returns:
+        str: The reason why the archive is corrupt, or None if it is valid.
+
+    Raises:
+        OSError: If the file could not be read, which says nothing about the archive itself.
+    """
+    if not os.path.exists(file_path):
+        return 'missing file'
+
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            bad_member = archive.testzip()
+
+    except zipfile.BadZipFile as error:
+        # Truncated downloads lose the central directory at the end of the file
+        return f'bad archive: {error}'
+
+    except (zlib.error, EOFError) as error:
+        # Damaged or truncated compressed data of a member
+        return f'unreadable archive: {error}'
+
+    if bad_member:
+        return f'bad CRC: {bad_member}'
+
+    return None
+
+def check_archive(file_path: str) -> tuple:
+    """Check a downloaded archive with verify_archive, returning the error of reading the file instead of raising it.
+
+    Args:
+        file_path (str): The path of the downloaded .zip file.
+
+    Returns:
+        tuple: The reason why the archive is corrupt (or None if it is valid), and the error of reading the file
+        (or None if it was read).
+    """
+    try:
+        return verify_archive(file_path), None
+
+    except OSError as error:
+        return None, str(error)
+
+def verify_archives(file_paths: list, workers: int = None) -> dict:
+    """Check many downloaded archives in a process pool.
+
+    Archives that could not be read are reported and left out, so they are not taken for corrupt.
+
+    Args:
+        file_paths (list): The paths of the downloaded .zip files.
+        workers (int): The number of processes, the number of CPUs if omitted.
+
+    Returns:
+        dict: The reason why each corrupt archive is corrupt, keyed by its path. Valid archives are left out.
+    """
+    errors = dict()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, (error, read_error) in zip(file_paths, executor.map(check_archive, file_paths, chunksize=64)):
+            if read_error:
+                print(f'Warning: {file_path} could not be checked ({read_error}): passed')
+
+            elif error:
+                errors[file_path] = error
+
+    return errors
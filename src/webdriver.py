@@ -2,13 +2,20 @@
 
 import os
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
 from webdriver_manager.chrome import ChromeDriverManager
 
+from .remote import EndpointPool
+
+# Number of trailing IMDb ID characters used to name a download shard
+SHARD_WIDTH = 3
+
 class Driver:
     """A class for initializing a Selenium webdriver based on the Chrome browser and managing download paths for subtitles.
 
     Args:
-        args: A Namespace object containing command line arguments parsed by argparse in subscraper.py.
+        args: A Namespace object containing command line arguments parsed by argparse in subscraper.py, or a Config object.
     """
 
     def __init__(self, args):
@@ -18,6 +25,7 @@ class Driver:
             args: A Namespace object containing command line arguments parsed by argparse in subscraper.py.
         """
         self.args = args
+        self.endpoint = None
 
     @property
     def download_path(self) -> str:
@@ -33,6 +41,24 @@ class Driver:
             # If the output path is relative, get the absolute path of the current working directory and append the output path and language subfolder
             return f"{os.path.abspath(os.path.join(os.path.abspath('.'), self.args.output_path))}/{self.args.language}"
 
+    def shard_path(self, imdb_id: str) -> str:
+        """Generates the download folder for a single movie.
+
+        When shard_downloads is enabled, downloads are spread over subfolders named after the last
+        characters of the IMDb ID (e.g. tt0133093 -> <download_path>/093). IMDb IDs are sequential,
+        so trailing digits distribute movies evenly and keep every folder small.
+
+        Args:
+            imdb_id (str): The IMDb ID of the movie.
+
+        Returns:
+            str: The absolute path to the folder where the subtitle of the movie is downloaded.
+        """
+        if self.args.shard_downloads and imdb_id:
+            return f'{self.download_path}/{imdb_id[-SHARD_WIDTH:]}'
+        else:
+            return self.download_path
+
     def create_download_folder(self) -> None:
         """
         Create the download folder if it does not exist.
@@ -49,6 +75,7 @@ class Driver:
         Create a WebDriver instance with Chrome options.
 
         The method sets the download preferences and Chrome options based on the arguments passed in the subscraper.py file.
+        If remote endpoints are given, the browser is started on the least loaded one instead of the local machine.
 
         Returns:
             The Chrome WebDriver instance.
@@ -71,6 +98,55 @@ class Driver:
 
         options.add_experimental_option('prefs', prefs)
 
+        # Create and return a remote WebDriver instance (if remote_webdriver is given)
+        if self.args.remote_webdriver:
+            return self.remote_webdriver(options)
+
         # Create and return a Chrome WebDriver instance
         # Create and return a Chrome WebDriver instance
         return webdriver.Chrome(options=options, executable_path=ChromeDriverManager().install())
+
+    def remote_webdriver(self, options):
+        """
+        Create a WebDriver instance on the least loaded healthy remote endpoint, trying the next one if it fails.
+
+        The Chrome remote connection is used so that DevTools commands (e.g. for sharded downloads) still work.
+        Downloads are saved on the remote machine, so the download path must be shared with it.
+
+        Args:
+            options: The Chrome options of the browser.
+
+        Returns:
+            The remote WebDriver instance.
+        """
+        pool = EndpointPool.shared(self.args.remote_webdriver, self.args.remote_max_sessions)
+
+        for _ in pool.endpoints:
+            endpoint = pool.acquire()
+            try:
+                driver = webdriver.Remote(command_executor=ChromeRemoteConnection(endpoint.url), options=options)
+
+            except WebDriverException as error:
+                print(f'Warning: Could not start a browser on {endpoint.url} ({error.msg})')
+                pool.release(endpoint, failed=True)
+                continue
+
+            self.endpoint = endpoint
+            return driver
+
+        raise RuntimeError('Could not start a browser on any remote WebDriver endpoint')
+
+    def quit_webdriver(self, driver):
+        """
+        Quit a WebDriver instance and free its session on the remote endpoint, if any.
+
+        Args:
+            driver: The WebDriver instance created by the webdriver method.
+        """
+        try:
+            driver.quit()
+
+        finally:
+            if self.endpoint:
+                EndpointPool.shared(self.args.remote_webdriver, self.args.remote_max_sessions).release(self.endpoint)
+                self.endpoint = None
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 # Import libraries
+import os
 import argparse
-from src import OpenSubtitles
+from src import Config, CueCorpus, OpenSubtitles, Pipeline, SubtitleIndex
 
 # Create argument parser
 parser = argparse.ArgumentParser(description='Get subtitles from opensubtitles.org')
@@ -13,6 +14,11 @@ group_filter = parser.add_argument_group('filter')
 group_driver = parser.add_argument_group('driver')
 group_download = parser.add_argument_group('download')
 group_process = parser.add_argument_group('process')
+group_library = parser.add_argument_group('library')
+group_pipeline = parser.add_argument_group('pipeline')
+group_verify = parser.add_argument_group('verify')
+group_corpus = parser.add_argument_group('corpus')
+group_search = parser.add_argument_group('search')
 
 # Add arguments for group main
 group_main.add_argument('--imdb_id', nargs='+', help='Specify one or more IMDb IDs for the movies (prefix with "tt" or fully numeric)')
@@ -24,19 +30,93 @@ group_filter.add_argument('--language', type=str, default='eng', help='Filter by
 # Add arguments for group driver
 group_driver.add_argument('--incognito', action='store_true', default=True, help='Launch the browser in incognito mode (private mode)')
 group_driver.add_argument('--headless', action='store_true', default=False, help='Launch the browser in headless mode (no graphical interface)')
+group_driver.add_argument('--remote_webdriver', nargs='+', default=[], help='Launch the browsers on these remote WebDriver URLs (Selenium Grid or chromedriver), append =N to a URL without a query string to set its own session limit')
+group_driver.add_argument('--remote_max_sessions', type=int, default=1, help='Maximum number of browsers launched on each remote WebDriver URL at the same time')
 
 # Add arguments for group download
 group_download.add_argument('--output_path', type=str, default='dump', help='Specify the path to the folder where to download the subtitles')
 group_download.add_argument('--safe_downloading', action='store_true', help='Wait until the download completes before getting the next subtitle (only works for bulk download)')
 group_download.add_argument('--change_file_names', action='store_true', help='Change the subtitle file names to their IMDb IDs after download complete')
+group_download.add_argument('--metadata_only', action='store_true', help='Only parse the subtitle information without downloading (use with --save_process to keep the results in metadata.json)')
+group_download.add_argument('--incremental', action='store_true', help='Only download subtitles newer than the ones downloaded on previous runs (needs --safe_downloading or --change_file_names to record the downloads)')
+group_download.add_argument('--shard_downloads', action='store_true', help='Download subtitles into subfolders named after the last digits of their IMDb IDs')
 
 # Add arguments for group process
 group_main.add_argument('--save_process', action='store_true', help='Save which movie were downloaded in a JSON file')
 group_main.add_argument('--save_process_path', type=str, default='process', help='Specify the path where to save the JSON file')
 group_main.add_argument('--reset_process', type=bool, default=False, help='Reset process')
 
+# Add arguments for group library
+group_library.add_argument('--video_path', type=str, help='Search subtitles for every video file in this folder by their OpenSubtitles hash instead of IMDb IDs')
+group_library.add_argument('--hash_workers', type=int, default=8, help='Number of threads used to hash the video files')
+
+# Add arguments for group pipeline
+group_pipeline.add_argument('--pipeline', action='store_true', help='Search, download and save the subtitles concurrently')
+group_pipeline.add_argument('--browsers', type=int, default=1, help='Number of browsers searching in parallel (only works with --pipeline)')
+group_pipeline.add_argument('--download_workers', type=int, default=4, help='Number of downloads waited and renamed in parallel (only works with --pipeline)')
+
+# Add arguments for group verify
+group_verify.add_argument('--verify_downloads', action='store_true', help='Check each downloaded archive and download it again if it is corrupt (only works with --safe_downloading)')
+group_verify.add_argument('--verify_archives', action='store_true', help='Check every downloaded archive saved in process.json and download the corrupt ones again')
+group_verify.add_argument('--verify_workers', type=int, help='Number of processes checking archives (default: number of CPUs)')
+
+# Add arguments for group corpus
+group_corpus.add_argument('--build_cue_corpus', action='store_true', help='Parse the downloaded subtitles saved in process.json into a memory-mapped cue corpus')
+group_corpus.add_argument('--cue_corpus_path', type=str, default='corpus/cues.bin', help='Specify the path of the cue corpus file')
+
+# Add arguments for group search
+group_search.add_argument('--search_index_path', type=str, help='Add the downloaded subtitles to the full-text index at this path')
+group_search.add_argument('--update_search_index', action='store_true', help='Add the downloads saved in process.json since the last update to the full-text index')
+group_search.add_argument('--search_subtitles', type=str, help='Print the subtitle lines containing all the given words')
+
 # Parse the arguments
 args = parser.parse_args()
 
-opensubs = OpenSubtitles(args=args)
-opensubs.execute()
\ No newline at end of file
+if args.browsers < 1 or args.download_workers < 1:
+    parser.error('--browsers and --download_workers must be at least 1')
+
+if (args.update_search_index or args.search_subtitles) and not args.search_index_path:
+    parser.error('--update_search_index and --search_subtitles require --search_index_path')
+
+config = Config.from_args(args)
+
+# Download subtitles if any movie is given
+if config.imdb_id or config.video_path:
+    if config.pipeline:
+        opensubs = Pipeline(args=config)
+    else:
+        opensubs = OpenSubtitles(args=config)
+
+    opensubs.execute()
+
+# Check the downloaded archives and download the corrupt ones again (if verify_archives flag is True)
+if config.verify_archives:
+    corrupt = OpenSubtitles.verify_process(os.path.abspath(config.save_process_path), config.verify_workers)
+    print(f'{len(corrupt)} corrupt archives found')
+
+    if corrupt:
+        if config.pipeline:
+            opensubs = Pipeline(args=config)
+        else:
+            opensubs = OpenSubtitles(args=config)
+
+        opensubs.execute(items=corrupt)
+
+# Build the cue corpus from the downloaded subtitles (if build_cue_corpus flag is True)
+if config.build_cue_corpus:
+    files = OpenSubtitles.downloaded_files(os.path.abspath(config.save_process_path))
+    count = CueCorpus.build(files, config.cue_corpus_path)
+    print(f'{count} subtitles written to {config.cue_corpus_path}')
+
+# Add the new downloads of process.json to the full-text index (if update_search_index flag is True)
+if config.update_search_index:
+    index = SubtitleIndex(config.search_index_path)
+    count = index.update(os.path.abspath(config.save_process_path))
+    print(f'{count} subtitles added to {config.search_index_path}')
+
+# Print the subtitle lines matching the search (if search_subtitles is given)
+if config.search_subtitles:
+    index = SubtitleIndex(config.search_index_path)
+    for match in index.search(config.search_subtitles):
+        start = f"{match['start'] // 3600000:02}:{match['start'] // 60000 % 60:02}:{match['start'] // 1000 % 60:02}"
+        print(f"{match['imdb_id']} {start} {match['text']}")